@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from itertools import product, chain, zip_longest, tee
+from functools import lru_cache
+from itertools import product
 
 
 # The amount of branches to generate
@@ -10,15 +11,12 @@ BRANCHES = 2 # branches
 IF, ELSE_IF, ELSE, END_IF = 0, 1, 2, 3
 
 NL = "\\n"
-dash = lambda ws: [" ", "-"][ws]
+DASH = (" ", "-")
 
 
-def trim(s, ws):
-    if ws[0]:
-        s = s.lstrip()
-    if ws[1]:
-        s = s.rstrip()
-    return s
+# Indexed by whether the whitespace on that side is trimmed
+LSTRIP = (lambda s: s, str.lstrip)
+RSTRIP = (lambda s: s, str.rstrip)
 
 
 def cond_kind(i, n):
@@ -33,53 +31,61 @@ def cond_kind(i, n):
         return ELSE_IF # else if
 
 
-# From: https://docs.python.org/3/library/itertools.html#itertools-recipes
-def pairwise(iterable):
-    a, b = tee(iterable)
-    next(b, None)
-    return zip(a, b)
+# Indexed as KINDS[n][i] instead of calling cond_kind(i, n)
+KINDS = [[cond_kind(i, n) for i in range(n + 2)] for n in range(BRANCHES + 2)]
+# Indexed by kind, formatted with the branch condition
+COND_NAMES = ("if {}", "else if {}", "else", "endif")
 
 
-def write_cond(conds, active_branch):
-    n = len(conds) - 1
-
+@lru_cache(maxsize=None)
+def cond_lits(n):
     lits = []
     for i in range(1, n + 2 + 1):
         ws1 = "\\n" * i
         ws2 = "\\r\\n" * i
         lits.append((ws1, str(i), ws2))
+    return tuple(lits)
 
-    conds = list(conds)
-    for i, (pws, nws) in enumerate(conds):
-        kind = cond_kind(i, n)
-        b = str(i == active_branch).lower()
-        cond = [f"if {b}", f"else if {b}", "else", "endif"][kind]
-        cond = f"{{%{dash(pws)} {cond} {dash(nws)}%}}"
-        conds[i] = cond
 
-    it = map("".join, lits)
-    it = filter(None, chain.from_iterable(zip_longest(it, conds)))
-    code = "".join(it)
+def write_cond(conds, active_branch):
+    n = len(conds) - 1
+    lits = cond_lits(n)
 
-    expected = f"{lits[0][0]}{lits[0][1]}"
-    for i, (cond, (before, after)) in enumerate(zip(conds, pairwise(lits))):
-        kind = cond_kind(i, n)
-        pws = cond.startswith("{%-")
-        nws = cond.endswith("-%}")
+    kinds = KINDS[n]
+    conds_ws = conds
+    conds = []
+    for i, (pws, nws) in enumerate(conds_ws):
+        b = str(i == active_branch).lower()
+        cond = COND_NAMES[kinds[i]].format(b)
+        conds.append(f"{{%{DASH[pws]} {cond} {DASH[nws]}%}}")
+
+    lit_strs = ["".join(lit) for lit in lits]
+    segments = []
+    for i, cond in enumerate(conds):
+        segments.append(lit_strs[i])
+        segments.append(cond)
+    segments.append(lit_strs[-1])
+    code = "".join(segments)
+
+    exp_parts = [lits[0][0], lits[0][1]]
+    for i, (pws, nws) in enumerate(conds_ws):
+        before = lits[i]
+        after = lits[i + 1]
+        kind = kinds[i]
 
         cond = i == active_branch
         prev_cond = i == (active_branch + 1)
 
         if prev_cond or (kind == IF):
-            expected += before[2] * (not pws)
+            exp_parts.append(before[2] * (not pws))
         if cond or (kind == END_IF):
-            expected += after[0] * (not nws)
-            expected += after[1]
+            exp_parts.append(after[0] * (not nws))
+            exp_parts.append(after[1])
 
     # FIXME: Askama does not include whitespace before eof
-    # expected += lits[-1][2]
+    # exp_parts.append(lits[-1][2])
 
-    return code, expected
+    return code, "".join(exp_parts)
 
 
 def write_match(contents, arms, match_ws):
@@ -87,13 +93,13 @@ def write_match(contents, arms, match_ws):
     code = before
 
     pws, nws = match_ws[0]
-    code += f"{{%{dash(pws)} match {expr} {dash(nws)}%}}"
+    code += f"{{%{DASH[pws]} match {expr} {DASH[nws]}%}}"
 
     for (arm, expr), (pws, nws) in zip(arms, match_ws[1:-1]):
-        code += f"{{%{dash(pws)} when {arm} {dash(nws)}%}}{expr}"
+        code += f"{{%{DASH[pws]} when {arm} {DASH[nws]}%}}{expr}"
 
     pws, nws = match_ws[-1]
-    code += f"{{%{dash(pws)} endmatch {dash(nws)}%}}"
+    code += f"{{%{DASH[pws]} endmatch {DASH[nws]}%}}"
     code += after
 
     return code
@@ -101,16 +107,16 @@ def write_match(contents, arms, match_ws):
 
 def write_match_result(active_arm, contents, arms, match_ws):
     before, expr, after = contents
-    expected = ""
+    arms_ws = match_ws[1:]
 
-    expected += trim(before, (False, match_ws[0][0]))
-    expected += trim(arms[active_arm][1], (match_ws[1:][active_arm][1], match_ws[1:][active_arm+1][0]))
-    expected += trim(after, (match_ws[-1][1], False))
+    expected = RSTRIP[match_ws[0][0]](before)
+    expected += RSTRIP[arms_ws[active_arm+1][0]](LSTRIP[arms_ws[active_arm][1]](arms[active_arm][1]))
+    expected += LSTRIP[match_ws[-1][1]](after)
     return expected
 
 
-def write_cond_tests(f):
-    f.write("""
+def write_cond_tests():
+    parts = ["""
 macro_rules! test_template {
     ($source:literal, $rendered:expr) => {{
         #[derive(Template)]
@@ -124,7 +130,7 @@ macro_rules! test_template {
 #[rustfmt::skip]
 #[test]
 fn test_cond_ws() {
-""")
+"""]
 
     for branches in range(1, BRANCHES + 1):
         for x in product([False, True], repeat=(branches+1)*2):
@@ -134,15 +140,16 @@ fn test_cond_ws() {
 
             for i in range(branches):
                 code, expected = write_cond(conds, i)
-                f.write(f'    test_template!("{code}", "{expected}");\n')
+                parts.append(f'    test_template!("{code}", "{expected}");\n')
 
         if branches != BRANCHES:
-            f.write("\n")
-    f.write("}\n")
+            parts.append("\n")
+    parts.append("}\n")
+    return "".join(parts)
 
 
-def write_match_tests(f):
-    f.write("""
+def write_match_tests():
+    parts = ["""
 #[rustfmt::skip]
 macro_rules! test_match {
     ($source:literal, $some_rendered:expr, $none_rendered:expr) => {{
@@ -160,7 +167,7 @@ macro_rules! test_match {
 #[rustfmt::skip]
 #[test]
 fn test_match_ws() {
-""")
+"""]
 
     contents = "before ", "item", "      after"
     arms = [("Some with (item)", "  foo   "), ("None", "    bar     ")]
@@ -173,14 +180,19 @@ fn test_match_ws() {
         some_expected = write_match_result(0, contents, arms, arms_ws)
         none_expected = write_match_result(1, contents, arms, arms_ws)
 
-        f.write(f'    test_match!("{code}", "{some_expected}", "{none_expected}");\n')
+        parts.append(f'    test_match!("{code}", "{some_expected}", "{none_expected}");\n')
 
-    f.write("}\n")
+    parts.append("}\n")
+    return "".join(parts)
 
 
 if __name__ == "__main__":
-    with open("ws.rs", "w") as f:
-        f.write("// This file is auto generated by gen_ws_tests.py\n\n")
-        f.write("use askama::Template;\n")
-        write_cond_tests(f)
-        write_match_tests(f)
+    output = "".join([
+        "// This file is auto generated by gen_ws_tests.py\n\n",
+        "use askama::Template;\n",
+        write_cond_tests(),
+        write_match_tests(),
+    ])
+
+    with open("ws.rs", "wb") as f:
+        f.write(output.encode("utf-8"))